@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for the Whisper transcription services
+
+Usage:
+    # K8s service, from whisper-service/
+    gunicorn -c gunicorn.conf.py whisper-service:app
+
+    # GPU service, from the repo root
+    gunicorn -c whisper-service/gunicorn.conf.py whisper-service:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# One worker holds the model; threads overlap upload reception with inference
+workers = 1
+threads = int(os.environ.get('THREADS', 8))
+worker_class = 'gthread'
+
+# No preload: CTranslate2 starts its worker threads (and, on GPU, a CUDA
+# context) when the model is loaded, and neither survives the fork into the
+# gunicorn worker
+preload_app = False
+
+# Long audio files can take several minutes to transcribe
+timeout = 600
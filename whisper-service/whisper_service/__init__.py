@@ -0,0 +1,7 @@
+"""
+Self-hosted Whisper transcription service for LearnByTesting
+"""
+
+from .app import create_app, load_model, run_dev_server
+
+__all__ = ['create_app', 'load_model', 'run_dev_server']
@@ -0,0 +1,535 @@
+"""
+Flask application for the self-hosted Whisper transcription service
+
+Both entrypoints (the GPU service at the repo root and the CPU service in
+whisper-service/) build their app with create_app(), so importing either one
+only loads the model it actually serves.
+
+Voice activity detection (VAD) uses the Silero model bundled with
+faster-whisper and runs on onnxruntime (installed with faster-whisper).
+Uploads are decoded in memory (soundfile + soxr for PCM, PyAV otherwise).
+"""
+
+from flask import Flask, Request, Response, request
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from werkzeug.exceptions import HTTPException, ServiceUnavailable
+import ctranslate2
+import numpy as np
+import soundfile as sf
+import soxr
+from collections import OrderedDict
+import functools
+import hashlib
+import orjson
+import io
+import os
+import tempfile
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+# Full tracebacks for request errors are opt-in (DEBUG_TRACEBACKS=1)
+DEBUG_TRACEBACKS = os.environ.get('DEBUG_TRACEBACKS') == '1'
+# Longest a request waits for its transcription once an inference thread has
+# picked it up (time spent queued does not count); 0 waits indefinitely
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 0))
+# Recent transcripts kept per app; 0 disables the cache
+TRANSCRIPT_CACHE_SIZE = int(os.environ.get('TRANSCRIPT_CACHE_SIZE', 128))
+
+# Whisper operates on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Audio longer than one 30 s window is split on VAD boundaries and its chunks
+# are decoded in batches of WHISPER_BATCH_SIZE
+BATCHED_MIN_DURATION = 30
+
+# Werkzeug spools multipart uploads to disk above 500 KB. Keep uploads up to
+# UPLOAD_SPOOL_MB in memory instead, since they are decoded in memory anyway.
+UPLOAD_SPOOL_SIZE = int(os.environ.get('UPLOAD_SPOOL_MB', 64)) * 1024 * 1024
+
+class SpooledUploadRequest(Request):
+    """Request that buffers file uploads in memory up to UPLOAD_SPOOL_SIZE"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE, mode='rb+')
+
+# --- Model Loading ---
+
+def resolve_compute_type(device, compute_type):
+    """
+    Map a requested compute type onto one the device supports.
+
+    'auto' prefers int8 weights with bf16 activations on Ampere+ GPUs (wider
+    exponent range than fp16, same tensor-core throughput), int8_float16 on
+    older GPUs and int8 on CPU, and otherwise lets CTranslate2 pick the
+    fastest type supported natively.
+    """
+    supported = ctranslate2.get_supported_compute_types(device)
+    logger.info(f"Supported compute types on {device}: {sorted(supported)}")
+
+    if compute_type == 'auto':
+        # CTranslate2 only reports bfloat16 types on compute capability >= 8.0
+        preferred = ('int8_bfloat16', 'int8_float16') if device == 'cuda' else ('int8',)
+        for candidate in preferred:
+            if candidate in supported:
+                return candidate
+    elif compute_type == 'int8' and 'int8' not in supported:
+        fallback = 'int8_float16' if 'int8_float16' in supported else 'auto'
+        logger.warning(f"int8 is not supported on {device}, falling back to {fallback}")
+        return fallback
+    return compute_type
+
+@functools.lru_cache(maxsize=None)
+def load_model(model_size, device, compute_type, cpu_threads, num_workers):
+    """
+    Load and warm up a WhisperModel.
+
+    Cached per configuration, so creating several apps (or importing both
+    entrypoints) in one process never loads the same model twice.
+    """
+    logger.info(f"Loading faster-whisper model: {model_size}")
+    logger.info(f"  - Device: {device}")
+    logger.info(f"  - Compute Type: {compute_type}")
+    logger.info("This may take a minute on first run (downloading and converting model)...")
+
+    try:
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers
+        )
+        logger.info(f"✓ faster-whisper model loaded successfully: {model_size}")
+    except Exception as e:
+        logger.error(f"Failed to load faster-whisper model: {e}")
+        if device == 'cuda':
+            logger.error("Make sure you have installed torch and CUDA correctly for your GPU.")
+        raise
+
+    # Dispatch one forward pass so cuBLAS/cuDNN algorithm selection
+    # happens now instead of on the first real request
+    logger.info("Warming up...")
+    try:
+        warm_up_start = time.time()
+        list(model.transcribe(np.zeros(SAMPLE_RATE * 5, dtype=np.float32), beam_size=1)[0])
+        logger.info(f"✓ Warm-up completed in {time.time() - warm_up_start:.2f}s")
+    except Exception as e:
+        logger.warning(f"Warm-up failed (continuing without it): {e}")
+
+    return model
+
+# --- Upload Decoding ---
+
+def read_upload(stream):
+    """
+    Read an upload stream into a single bytes object.
+
+    Werkzeug's spooled upload file is seekable, so its size is known and one
+    exactly-sized read is enough. The result is bytes, which io.BytesIO in
+    load_audio shares instead of copying.
+    """
+    try:
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+    except (AttributeError, OSError):  # io.UnsupportedOperation: not seekable
+        return stream.read()
+    return stream.read(size)
+
+def load_audio(audio_bytes):
+    """
+    Decode an uploaded audio file in memory.
+
+    PCM containers (wav, flac, ogg) are decoded with soundfile and resampled
+    to 16 kHz mono. Anything soundfile cannot read (mp3, m4a, ...) is decoded
+    by faster-whisper's FFmpeg bindings. Decoding happens on the HTTP thread
+    so it overlaps with inference for other requests.
+    """
+    try:
+        data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=False)
+    except RuntimeError:  # soundfile.LibsndfileError: not a PCM container
+        return decode_audio(io.BytesIO(audio_bytes), sampling_rate=SAMPLE_RATE)
+
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        data = soxr.resample(data, sample_rate, SAMPLE_RATE, quality='HQ')
+    return data
+
+def fastjsonify(data):
+    """jsonify() replacement that serializes with orjson"""
+    return Response(orjson.dumps(data), mimetype='application/json')
+
+def parse_cpu_list(value):
+    """Parse a Linux-style CPU list such as '0-3,8,10-11' into a set of ids"""
+    cpus = set()
+    for part in value.split(','):
+        start, _, end = part.strip().partition('-')
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+# --- Application Factory ---
+
+def create_app(model_size='base', device='cpu', compute_type='auto', num_workers=1, cors=False):
+    """
+    Build the transcription app and load its model.
+
+    The arguments are per-entrypoint defaults; WHISPER_MODEL, WHISPER_DEVICE,
+    WHISPER_COMPUTE_TYPE and WHISPER_NUM_WORKERS override them. num_workers
+    is both the number of inference threads and of CTranslate2 workers, so
+    that many transcriptions run in parallel.
+    """
+    model_size = os.environ.get('WHISPER_MODEL', model_size)
+    device = os.environ.get('WHISPER_DEVICE', device)
+    compute_type = resolve_compute_type(device, os.environ.get('WHISPER_COMPUTE_TYPE', compute_type))
+    num_workers = int(os.environ.get('WHISPER_NUM_WORKERS', num_workers))
+    # Greedy decoding by default; set WHISPER_BEAM=5 for quality-critical jobs
+    beam_size = int(os.environ.get('WHISPER_BEAM', '1'))
+    # Timestamp tokens are skipped unless a client needs segment start/end times
+    with_timestamps = os.environ.get('WITH_TIMESTAMPS', 'false').lower() == 'true'
+    batch_size = int(os.environ.get('WHISPER_BATCH_SIZE', 16))
+
+    # Size CTranslate2's OpenMP pool explicitly instead of letting it claim every
+    # core. cpu_threads is per CTranslate2 worker; by default all workers together
+    # use half the available CPUs (roughly the physical cores with SMT)
+    available_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    cpu_threads = int(os.environ.get('CPU_THREADS', max(1, len(available_cpus) // 2 // num_workers)))
+
+    # Pinning is opt-in: inside a container the affinity mask is usually the
+    # whole node, and pinning also confines HTTP threads and audio decoding
+    cpu_affinity = os.environ.get('WHISPER_CPU_AFFINITY')
+    if cpu_affinity and hasattr(os, 'sched_setaffinity'):
+        cpus = parse_cpu_list(cpu_affinity)
+        logger.info(f"Pinning process to CPUs: {sorted(cpus)}")
+        os.sched_setaffinity(0, cpus)
+
+    model = load_model(model_size, device, compute_type, cpu_threads, num_workers)
+    # Report what CTranslate2 actually selected (relevant for 'auto')
+    compute_type = getattr(model.model, 'compute_type', compute_type)
+
+    app = Flask(__name__)
+    app.request_class = SpooledUploadRequest
+    # Explicit upload cap so oversized requests are rejected instead of buffered
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 1024)) * 1024 * 1024
+    app.config['WHISPER_MODEL'] = model_size
+    app.config['WHISPER_DEVICE'] = device
+    app.config['WHISPER_COMPUTE_TYPE'] = compute_type
+    app.config['WHISPER_BEAM'] = beam_size
+
+    @app.errorhandler(HTTPException)
+    def http_error(e):
+        """Return HTTP errors (413, 503, ...) as JSON like the other error responses"""
+        return fastjsonify({
+            'error': e.description,
+            'error_type': type(e).__name__
+        }), e.code
+
+    if cors:
+        from flask_cors import CORS
+        CORS(app)  # Enable CORS for all routes
+
+    # --- Inference Threads ---
+    # HTTP threads only receive and decode uploads; transcription is handed to
+    # num_workers inference threads, one per CTranslate2 worker, so concurrent
+    # requests never contend for the same model replica.
+    inference_queue = queue.Queue()
+
+    def inference_worker():
+        """Run queued transcription jobs one after another."""
+        batched_model = BatchedInferencePipeline(model=model)
+        while True:
+            job = inference_queue.get()
+            job['started'].set()
+            audio, options = job['audio'], job['options']
+            try:
+                # Batched mode chunks on VAD boundaries, so it needs the VAD filter
+                if options.get('vad_filter') and len(audio) > BATCHED_MIN_DURATION * SAMPLE_RATE:
+                    segments, info = batched_model.transcribe(audio, batch_size=batch_size, **options)
+                else:
+                    segments, info = model.transcribe(audio, **options)
+                # Segments are generated lazily, so decode them here, not in the HTTP thread
+                job['result'] = (list(segments), info)
+            except Exception as e:
+                job['error'] = e
+            finally:
+                with job['lock']:
+                    job['done'].set()
+                    abandoned = job.get('cancelled', False)
+
+            # The request timed out while this job ran; hand the result over
+            # anyway so a retry of the same upload is served from the cache
+            if abandoned and 'result' in job and job['on_late_result'] is not None:
+                try:
+                    job['on_late_result'](*job['result'])
+                except Exception as e:
+                    logger.error("Failed to store late transcription result: %s", e)
+
+    def inference_alive():
+        """Return True while at least one inference thread is running."""
+        return any(thread.is_alive() for thread in inference_threads)
+
+    def wait_for_job(event, timeout=None):
+        """Wait for a job event, failing fast if every inference thread has died."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = 1 if deadline is None else min(1, deadline - time.monotonic())
+            if event.wait(max(remaining, 0)):
+                return True
+            if not inference_alive():
+                raise ServiceUnavailable('No inference thread is running')
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def run_inference(audio, on_late_result=None, **options):
+        """
+        Queue audio for an inference thread and block until it is transcribed.
+
+        INFERENCE_TIMEOUT only counts from the moment an inference thread
+        starts the job. If the request gives up before the job finishes, the
+        result is passed to on_late_result(segments, info) instead.
+        """
+        if not inference_alive():
+            raise ServiceUnavailable('No inference thread is running')
+
+        job = {
+            'audio': audio,
+            'options': options,
+            'on_late_result': on_late_result,
+            'lock': threading.Lock(),
+            'started': threading.Event(),
+            'done': threading.Event()
+        }
+        inference_queue.put(job)
+        wait_for_job(job['started'])
+        if not wait_for_job(job['done'], INFERENCE_TIMEOUT or None):
+            with job['lock']:
+                if not job['done'].is_set():
+                    job['cancelled'] = True
+                    raise ServiceUnavailable(f'Transcription did not finish within {INFERENCE_TIMEOUT:g}s')
+        if 'error' in job:
+            raise job['error']
+        if 'result' not in job:  # the inference thread died while running the job
+            raise ServiceUnavailable('Inference thread stopped')
+        return job['result']
+
+    inference_threads = [
+        threading.Thread(target=inference_worker, name=f'whisper-inference-{i}', daemon=True)
+        for i in range(num_workers)
+    ]
+    for thread in inference_threads:
+        thread.start()
+
+    # --- Transcript Cache ---
+    # Identical re-uploads (client retries, UI development) skip inference entirely.
+    # Keyed by the SHA-256 of the upload plus every request option that changes
+    # the output; each app has its own cache, so model settings never mix.
+    transcript_cache = OrderedDict()
+    transcript_cache_lock = threading.Lock()
+
+    def get_cached_transcript(key):
+        """Return the cached response for key, or None on a miss."""
+        with transcript_cache_lock:
+            result = transcript_cache.get(key)
+            if result is not None:
+                transcript_cache.move_to_end(key)
+            return result
+
+    def cache_transcript(key, result):
+        """Store a response, evicting the least recently used entries."""
+        if TRANSCRIPT_CACHE_SIZE <= 0:
+            return
+        with transcript_cache_lock:
+            transcript_cache[key] = result
+            transcript_cache.move_to_end(key)
+            while len(transcript_cache) > TRANSCRIPT_CACHE_SIZE:
+                transcript_cache.popitem(last=False)
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        """Health check endpoint (503 once no inference thread is left)"""
+        alive = inference_alive()
+        return fastjsonify({
+            'status': 'ok' if alive else 'error',
+            'service': 'faster-whisper-transcription',
+            'model': model_size,
+            'device': device,
+            'compute_type': compute_type,
+            'beam_size': beam_size,
+            'with_timestamps': with_timestamps,
+            'queue_depth': inference_queue.qsize(),
+            'timestamp': time.time()
+        }), 200 if alive else 503
+
+    @app.route('/transcribe', methods=['POST'])
+    def transcribe():
+        """
+        Transcribe audio file
+
+        Expected form data:
+        - audio: Audio file (wav, mp3, m4a, flac, etc.)
+        - language: Language code (optional, auto-detects if omitted)
+        - vad_filter: Skip non-speech regions with Silero VAD (optional, default: true)
+        - min_silence_duration_ms: Minimum silence length split by VAD (optional, default: 500)
+
+        Returns:
+        - transcript: Transcribed text
+        - language: Detected/specified language
+        - duration: Audio duration in seconds
+        - processing_time: Request processing time in seconds
+        - model: Model size used
+        - segments: Segment start/end times and text (only when WITH_TIMESTAMPS=true)
+        - cached: Present and true when served from the transcript cache
+        """
+        start_time = time.time()
+
+        try:
+            if 'audio' not in request.files:
+                logger.error("No audio file in request")
+                return fastjsonify({'error': 'No audio file provided'}), 400
+
+            audio_file = request.files['audio']
+            language = request.form.get('language') # Let faster-whisper detect if None
+            vad_filter = request.form.get('vad_filter', 'true').lower() != 'false'
+            min_silence_duration_ms = request.form.get('min_silence_duration_ms', '500')
+
+            if audio_file.filename == '':
+                logger.error("Empty filename")
+                return fastjsonify({'error': 'Empty filename'}), 400
+
+            if not min_silence_duration_ms.isdecimal():
+                logger.error("Invalid min_silence_duration_ms: %s", min_silence_duration_ms)
+                return fastjsonify({'error': 'min_silence_duration_ms must be a non-negative integer'}), 400
+            min_silence_duration_ms = int(min_silence_duration_ms)
+
+            logger.info("Received transcription request:")
+            logger.info("  - Filename: %s", audio_file.filename)
+            logger.info("  - Language: %s", language or 'auto-detect')
+            logger.info("  - VAD filter: %s (min silence: %dms)", vad_filter, min_silence_duration_ms)
+
+            # Decode in memory instead of round-tripping through a temp file
+            audio_bytes = read_upload(audio_file.stream)
+            logger.info("  - File size: %.2f MB", len(audio_bytes) / 1048576)
+
+            cache_key = (
+                hashlib.sha256(audio_bytes).hexdigest(),
+                language, model_size, beam_size, vad_filter, min_silence_duration_ms
+            )
+            cached = get_cached_transcript(cache_key)
+            if cached is not None:
+                elapsed_time = time.time() - start_time
+                logger.info("✓ Returning cached transcript (%.2fs)", elapsed_time)
+                return fastjsonify({**cached, 'processing_time': elapsed_time, 'cached': True})
+
+            def build_result(segments, info):
+                result = {
+                    'transcript': "".join(segment.text for segment in segments).strip(),
+                    'language': info.language,
+                    'duration': info.duration,
+                    'processing_time': time.time() - start_time,
+                    'model': model_size
+                }
+                if with_timestamps:
+                    result['segments'] = [
+                        {'start': segment.start, 'end': segment.end, 'text': segment.text}
+                        for segment in segments
+                    ]
+                return result
+
+            def cache_late_result(segments, info):
+                cache_transcript(cache_key, build_result(segments, info))
+                logger.info("✓ Cached transcript of a request that timed out")
+
+            audio = load_audio(audio_bytes)
+            logger.info("Starting transcription...")
+
+            # Transcribe using faster-whisper
+            segments, info = run_inference(
+                audio,
+                on_late_result=cache_late_result,
+                language=language,
+                beam_size=beam_size,
+                condition_on_previous_text=False,
+                temperature=0.0,
+                without_timestamps=not with_timestamps,
+                vad_filter=vad_filter,
+                vad_parameters=dict(min_silence_duration_ms=min_silence_duration_ms)
+            )
+
+            result = build_result(segments, info)
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✓ Transcription completed in %.2fs", result['processing_time'])
+                logger.info("  - Transcript length: %d characters", len(result['transcript']))
+                logger.info("  - Audio duration: %.2fs", result['duration'])
+                logger.info("  - Detected language: %s (Probability: %.2f)", result['language'], info.language_probability)
+
+            cache_transcript(cache_key, result)
+
+            return fastjsonify(result)
+
+        except HTTPException:
+            # e.g. RequestEntityTooLarge from MAX_CONTENT_LENGTH: keep its status code
+            raise
+        except Exception as e:
+            logger.error("Transcription error: %s", e, exc_info=DEBUG_TRACEBACKS)
+
+            return fastjsonify({
+                'error': str(e),
+                'error_type': type(e).__name__
+            }), 500
+
+    @app.route('/', methods=['GET'])
+    def index():
+        """Root endpoint with service info"""
+        return fastjsonify({
+            'service': 'Self-hosted faster-whisper Transcription Service',
+            'version': '2.1.0',
+            'model': model_size,
+            'device': device,
+            'compute_type': compute_type,
+            'endpoints': {
+                'health': '/health - GET - Health check',
+                'transcribe': '/transcribe - POST - Transcribe audio file'
+            },
+            'usage': {
+                'transcribe': {
+                    'method': 'POST',
+                    'content_type': 'multipart/form-data',
+                    'fields': {
+                        'audio': 'Audio file (required)',
+                        'language': 'Language code like "en", "es" (optional, auto-detects if omitted)',
+                        'vad_filter': 'Skip silence with voice activity detection: "true" or "false" (optional, default: true)',
+                        'min_silence_duration_ms': 'Minimum silence duration in ms used by VAD (optional, default: 500)'
+                    }
+                }
+            }
+        })
+
+    return app
+
+def run_dev_server(app):
+    """Run the app on Flask's development server (local use only)."""
+    port = int(os.environ.get('PORT', 5000))
+
+    logger.info("="*60)
+    logger.info("Self-hosted faster-whisper Transcription Service")
+    logger.info("="*60)
+    logger.info(f"Model: {app.config['WHISPER_MODEL']}")
+    logger.info(f"Device: {app.config['WHISPER_DEVICE']}")
+    logger.info(f"Compute Type: {app.config['WHISPER_COMPUTE_TYPE']}")
+    logger.info(f"Beam Size: {app.config['WHISPER_BEAM']}")
+    logger.info(f"Starting server on http://0.0.0.0:{port}")
+    logger.info("Development server - use gunicorn with whisper-service/gunicorn.conf.py in production")
+    logger.info("Press Ctrl+C to stop")
+    logger.info("="*60)
+
+    # Run on all interfaces so it's accessible from network
+    app.run(
+        host='0.0.0.0',
+        port=port,
+        debug=False,
+        threaded=True
+    )